@@ -2,11 +2,26 @@ import sys
 import ctypes
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QToolBar, QSlider,
-    QLabel, QFileDialog, QColorDialog, QPushButton, QHBoxLayout, QVBoxLayout
+    QLabel, QFileDialog, QColorDialog, QPushButton, QProgressBar, QHBoxLayout, QVBoxLayout
 )
-from PySide6.QtGui import QPainter, QPen, QColor, QPixmap, QCursor, QIcon
-from PySide6.QtCore import Qt, QPoint, QRect
+from PySide6.QtGui import (
+    QPainter, QPen, QColor, QImage, QImageReader, QImageIOHandler, QPixmap, QPolygon, QRegion, QFont,
+    QCursor, QIcon
+)
+from PySide6.QtCore import (
+    Qt, QCoreApplication, QObject, QRunnable, QThreadPool, Signal, QPoint, QPointF, QRect, QRectF, QSize, QTimer
+)
+from array import array
 from collections import deque
+from itertools import islice
+import hashlib
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
 
 APP_NAME = "GM-PENCIL"
 APP_ID = "com.gm.pencil.ultimate.2025"
@@ -24,20 +39,187 @@ class Tool:
     ELLIPSE = "Ellipse"
     BUCKET = "Bucket"
 
+HISTORY_LIMIT = 50
+CHECKPOINT_INTERVAL = 20
+TILE_SIZE = 128
+STAMP_CACHE_LIMIT = 64
+STAMP_MIN_DIAMETER = 40
+FRAME_INTERVAL_MS = 1000 // 60
+SIZE_DEBOUNCE_MS = 30
+BACKING_GROWTH = 1.5
+ICON_SIZE = 24
+ICON_PIXMAP_SIZE = 32
+
+class HistoryEntry:
+    def __init__(self, kind, payload=None):
+        self.kind = kind
+        self.payload = payload
+        self.bbox = None
+        self.checkpoint = None
+
+def color_mask(pixels, target, tol=10):
+    mask = np.abs(((pixels >> 16) & 0xFF).astype(np.int16) - ((target >> 16) & 0xFF)) <= tol
+    mask &= np.abs(((pixels >> 8) & 0xFF).astype(np.int16) - ((target >> 8) & 0xFF)) <= tol
+    mask &= np.abs((pixels & 0xFF).astype(np.int16) - (target & 0xFF)) <= tol
+    return mask
+
+def image_pixels(img):
+    return np.ndarray((img.height(), img.width()), np.uint32, img.bits(), strides=(img.bytesPerLine(), 4))
+
+class TaskSignals(QObject):
+    finished = Signal(object)
+
+class LoadTask(QRunnable):
+    def __init__(self, path, size):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.signals = TaskSignals()
+
+    def run(self):
+        reader = QImageReader(self.path)
+        size = reader.size().scaled(self.size, Qt.KeepAspectRatio)
+        scaled_decode = size.isValid() and reader.supportsOption(QImageIOHandler.ScaledSize)
+        if scaled_decode:
+            reader.setScaledSize(size)
+        loaded = reader.read()
+        if loaded.isNull():
+            self.signals.finished.emit(None)
+            return
+        if not scaled_decode:
+            loaded = loaded.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.signals.finished.emit(loaded.convertToFormat(QImage.Format_ARGB32_Premultiplied))
+
+class SaveTask(QRunnable):
+    def __init__(self, image, path):
+        super().__init__()
+        self.image = image
+        self.path = path
+        self.signals = TaskSignals()
+
+    def run(self):
+        self.signals.finished.emit(self.image.save(self.path))
+
+def premultiply(rgba):
+    alpha = rgba >> 24
+    if alpha == 255:
+        return rgba
+    channels = [((rgba >> shift) & 0xFF) * alpha // 255 for shift in (16, 8, 0)]
+    return (alpha << 24) | (channels[0] << 16) | (channels[1] << 8) | channels[2]
+
+def flood_fill(img, x, y, rgba, tol=10):
+    width = img.width()
+    height = img.height()
+    if x < 0 or x >= width or y < 0 or y >= height:
+        return None
+    arr = image_pixels(img)
+    target = int(arr[y, x])
+    replacement = np.uint32(rgba)
+    if target == rgba:
+        return None
+
+    mask = color_mask(arr, target, tol)
+    fill = scan_fill_native if numba is not None else scan_fill
+    left, top, right, bottom = fill(arr, mask, x, y, replacement)
+    return QRect(left, top, right - left + 1, bottom - top + 1)
+
+def scan_fill(arr, mask, x, y, replacement):
+    height, width = mask.shape
+    top, bottom, min_x, max_x = y, y, x, x
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        row = mask[y]
+        if not row[x]:
+            continue
+
+        blocked = ~row[x::-1]
+        left = x - int(np.argmax(blocked)) + 1 if blocked.any() else 0
+        blocked = ~row[x:]
+        right = x + int(np.argmax(blocked)) - 1 if blocked.any() else width - 1
+
+        row[left:right + 1] = False
+        arr[y, left:right + 1] = replacement
+        top, bottom = min(top, y), max(bottom, y)
+        min_x, max_x = min(min_x, left), max(max_x, right)
+
+        for ny in (y - 1, y + 1):
+            if 0 <= ny < height:
+                span = mask[ny, left:right + 1]
+                starts = np.flatnonzero(span[1:] & ~span[:-1]) + 1
+                if span[0]:
+                    stack.append((left, ny))
+                stack.extend((left + int(s), ny) for s in starts)
+
+    return min_x, top, max_x, bottom
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def scan_fill_native(arr, mask, x, y, replacement):
+        height, width = mask.shape
+        top, bottom, min_x, max_x = y, y, x, x
+        stack = [(x, y)]
+        while len(stack) > 0:
+            x, y = stack.pop()
+            if not mask[y, x]:
+                continue
+
+            left = x
+            while left > 0 and mask[y, left - 1]:
+                left -= 1
+            right = x
+            while right < width - 1 and mask[y, right + 1]:
+                right += 1
+
+            for i in range(left, right + 1):
+                mask[y, i] = False
+                arr[y, i] = replacement
+            top, bottom = min(top, y), max(bottom, y)
+            min_x, max_x = min(min_x, left), max(max_x, right)
+
+            for ny in (y - 1, y + 1):
+                if 0 <= ny < height:
+                    inside = False
+                    for i in range(left, right + 1):
+                        if mask[ny, i] and not inside:
+                            stack.append((i, ny))
+                        inside = mask[ny, i]
+
+        return min_x, top, max_x, bottom
+
+    scan_fill_native(np.zeros((1, 1), np.uint32), np.ones((1, 1), np.bool_), 0, 0, np.uint32(0))
+
 class Canvas(QWidget):
+    busy = Signal(str)
+    idle = Signal(str)
+
     def __init__(self):
         super().__init__()
         self.setMinimumSize(1000, 600)
         self.setCursor(Qt.CrossCursor)
-        self.pixmap = QPixmap(self.size())
-        self.pixmap.fill(Qt.white)
-        self.history = []
-        self.redo_stack = []
+        self.image = QImage(self.size(), QImage.Format_ARGB32_Premultiplied)
+        self.image.fill(Qt.white)
+        self.history = deque(maxlen=HISTORY_LIMIT + CHECKPOINT_INTERVAL)
+        self.redo_stack = deque(maxlen=HISTORY_LIMIT + CHECKPOINT_INTERVAL)
+        self.tile_store = {}
         self.pen_color = QColor("#000000")
         self.pen_size = 4
+        self.white = QColor(Qt.white)
+        self.stamp_cache = {}
+        self.rebuild_pens()
         self.tool = Tool.PEN
+        self.antialiasing = False
         self.start_point = QPoint()
         self.last_point = QPoint()
+        self.current_entry = None
+        self.pending_image = None
+        self.stroke_painter = None
+        self.dirty = QRegion()
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self.flush_frame)
+        self.checkpoint_due = False
         self.setStyleSheet("""
             background-color:#1e1e1e;
             border:2px solid #333;
@@ -45,127 +227,349 @@ class Canvas(QWidget):
         """)
 
     def resizeEvent(self, event):
-        if self.pixmap.size() != self.size():
-            new_pixmap = QPixmap(self.size())
-            new_pixmap.fill(Qt.white)
-            painter = QPainter(new_pixmap)
-            painter.drawPixmap(0, 0, self.pixmap)
-            self.pixmap = new_pixmap
-            self.update()
+        old = self.image.size()
+        width, height = self.width(), self.height()
+        if width > old.width() or height > old.height():
+            self.flush_stroke()
+            if width > old.width():
+                width = max(width, int(old.width() * BACKING_GROWTH))
+            if height > old.height():
+                height = max(height, int(old.height() * BACKING_GROWTH))
+            self.image = self.grow_image(self.image, QSize(width, height))
+            if self.stroke_painter is not None:
+                self.end_stroke()
+                self.begin_stroke(self.current_entry)
+            self.checkpoint_due = True
+            self.mark_dirty(self.rect())
+
+    def grow_image(self, image, size):
+        old = image.size()
+        size = size.expandedTo(old)
+        if size == old:
+            return image
+        width, height = size.width(), size.height()
+        new_image = QImage(size, QImage.Format_ARGB32_Premultiplied)
+        painter = QPainter(new_image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(0, 0, image)
+        painter.fillRect(old.width(), 0, width - old.width(), height, Qt.white)
+        painter.fillRect(0, old.height(), old.width(), height - old.height(), Qt.white)
+        painter.end()
+        return new_image
 
     def paintEvent(self, event):
+        rect = event.rect()
         painter = QPainter(self)
-        painter.drawPixmap(0, 0, self.pixmap)
+        painter.drawImage(rect, self.image, rect)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self.save_state()
             self.start_point = event.position().toPoint()
             self.last_point = self.start_point
-            if self.tool == Tool.BUCKET:
+            if self.tool in (Tool.PEN, Tool.ERASER):
+                self.current_entry = self.push_entry(HistoryEntry("stroke", {
+                    "tool": self.tool, "rgba": self.pen_color.rgba(), "size": self.pen_size,
+                    "antialias": self.antialiasing,
+                    "points": array("i", (self.start_point.x(), self.start_point.y())), "breaks": array("i")
+                }))
+                self.begin_stroke(self.current_entry)
+            elif self.tool == Tool.BUCKET:
                 self.bucket_fill(self.start_point)
+            else:
+                self.current_entry = HistoryEntry("shape", {
+                    "tool": self.tool, "rgba": self.pen_color.rgba(), "size": self.pen_size,
+                    "antialias": self.antialiasing, "p1": (self.start_point.x(), self.start_point.y())
+                })
 
     def mouseMoveEvent(self, event):
-        if event.buttons() & Qt.LeftButton:
-            painter = QPainter(self.pixmap)
-            if self.tool in (Tool.PEN, Tool.ERASER):
-                pen = QPen(self.pen_color if self.tool != Tool.ERASER else QColor("#ffffff"),
-                           self.pen_size if self.tool != Tool.ERASER else self.pen_size*3)
-                pen.setCapStyle(Qt.RoundCap)
-                painter.setPen(pen)
-                current = event.position().toPoint()
-                painter.drawLine(self.last_point, current)
-                self.last_point = current
-                self.update()
+        if event.buttons() & Qt.LeftButton and self.stroke_painter is not None:
+            current = event.position().toPoint()
+            self.current_entry.payload["points"].extend((current.x(), current.y()))
+            self.schedule_frame()
+
+    def flush_stroke(self):
+        entry = self.current_entry
+        if self.stroke_painter is None or entry is None:
+            return
+        points = entry.payload["points"]
+        breaks = entry.payload["breaks"]
+        start = breaks[-1] if breaks else 0
+        last = len(points) // 2 - 1
+        if start == last:
+            return
+        batch = points[2 * start:]
+        self.draw_batch(self.stroke_painter, entry.payload, batch, start == 0)
+        breaks.append(last)
+        pad = self.stroke_diameter(entry.payload) // 2 + 2
+        xs, ys = batch[0::2], batch[1::2]
+        dirty = QRect(QPoint(min(xs), min(ys)), QPoint(max(xs), max(ys))).adjusted(-pad, -pad, pad, pad)
+        entry.bbox = entry.bbox.united(dirty) if entry.bbox else dirty
+        self.last_point = QPoint(points[-2], points[-1])
+        self.mark_dirty(dirty)
+
+    def schedule_frame(self):
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def mark_dirty(self, rect):
+        self.dirty = self.dirty.united(rect)
+        self.schedule_frame()
+
+    def flush_frame(self):
+        self.flush_stroke()
+        if not self.dirty.isEmpty():
+            region = self.dirty
+            self.dirty = QRegion()
+            self.update(region)
 
     def mouseReleaseEvent(self, event):
-        painter = QPainter(self.pixmap)
-        painter.setPen(QPen(self.pen_color, self.pen_size))
-        end = event.position().toPoint()
-        if self.tool == Tool.LINE:
-            painter.drawLine(self.start_point, end)
-        elif self.tool == Tool.RECT:
-            painter.drawRect(QRect(self.start_point, end))
-        elif self.tool == Tool.ELLIPSE:
-            painter.drawEllipse(QRect(self.start_point, end))
-        self.update()
-
-    def save_state(self):
-        self.history.append(self.pixmap.copy())
-        if len(self.history) > 50:
-            self.history.pop(0)
+        entry = self.current_entry
+        self.flush_stroke()
+        self.current_entry = None
+        self.end_stroke()
+        if entry is not None and entry.kind == "shape":
+            end = event.position().toPoint()
+            entry.payload["p2"] = (end.x(), end.y())
+            self.paint_entry(self.image, self.push_entry(entry))
+            self.update_entry(entry)
+        if self.pending_image is not None:
+            self.show_loaded_image(self.pending_image)
+            self.pending_image = None
+
+    def begin_stroke(self, entry):
+        self.stroke_painter = QPainter(self.image)
+        self.prepare_stroke(self.stroke_painter, entry.payload)
+
+    def end_stroke(self):
+        if self.stroke_painter is not None:
+            self.stroke_painter.end()
+            self.stroke_painter = None
+
+    def rebuild_pens(self):
+        self.active_pen = QPen(self.pen_color, self.pen_size, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self.eraser_pen = QPen(self.white, self.pen_size * 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self.shape_pen = QPen(self.pen_color, self.pen_size)
+
+    def stroke_diameter(self, payload):
+        return payload["size"] * 3 if payload["tool"] == Tool.ERASER else payload["size"]
+
+    def stroke_pen(self, payload):
+        if payload["tool"] == Tool.ERASER:
+            if self.eraser_pen.width() == payload["size"] * 3:
+                return self.eraser_pen
+            return QPen(self.white, payload["size"] * 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        if self.active_pen.width() == payload["size"] and self.active_pen.color().rgba() == payload["rgba"]:
+            return self.active_pen
+        return QPen(QColor.fromRgba(payload["rgba"]), payload["size"], Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+    def prepare_stroke(self, painter, payload):
+        if self.stroke_diameter(payload) < STAMP_MIN_DIAMETER:
+            self.prepare_painter(painter, self.stroke_pen(payload), payload["antialias"])
+
+    def draw_batch(self, painter, payload, points, first):
+        if self.stroke_diameter(payload) < STAMP_MIN_DIAMETER:
+            painter.drawPolyline(QPolygon([QPoint(x, y) for x, y in zip(points[0::2], points[1::2])]))
+        else:
+            self.draw_stamps(painter, self.stamp_for(payload), points, first)
+
+    def stamp_for(self, payload):
+        diameter = self.stroke_diameter(payload)
+        rgba = self.white.rgba() if payload["tool"] == Tool.ERASER else payload["rgba"]
+        key = (rgba, diameter, payload["antialias"])
+        stamp = self.stamp_cache.get(key)
+        if stamp is None:
+            if len(self.stamp_cache) >= STAMP_CACHE_LIMIT:
+                self.stamp_cache.clear()
+            stamp = QImage(diameter, diameter, QImage.Format_ARGB32_Premultiplied)
+            stamp.fill(Qt.transparent)
+            painter = QPainter(stamp)
+            painter.setRenderHint(QPainter.Antialiasing, payload["antialias"])
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor.fromRgba(rgba))
+            painter.drawEllipse(QRectF(0, 0, diameter, diameter))
+            painter.end()
+            self.stamp_cache[key] = stamp
+        return stamp
+
+    def draw_stamps(self, painter, stamp, points, first):
+        offset = stamp.width() / 2
+        spacing = max(1.0, stamp.width() / 4)
+        xs, ys = points[0::2], points[1::2]
+        if first:
+            painter.drawImage(QPointF(xs[0] - offset, ys[0] - offset), stamp)
+        for ax, ay, bx, by in zip(xs, ys, xs[1:], ys[1:]):
+            dx, dy = bx - ax, by - ay
+            steps = max(1, math.ceil(math.hypot(dx, dy) / spacing))
+            for i in range(1, steps + 1):
+                painter.drawImage(QPointF(ax + dx * i / steps - offset, ay + dy * i / steps - offset), stamp)
+
+    def shape_pen_for(self, payload):
+        if self.shape_pen.width() == payload["size"] and self.shape_pen.color().rgba() == payload["rgba"]:
+            return self.shape_pen
+        return QPen(QColor.fromRgba(payload["rgba"]), payload["size"])
+
+    def prepare_painter(self, painter, pen, antialias):
+        painter.setPen(pen)
+        painter.setRenderHint(QPainter.Antialiasing, antialias)
+        if pen.color().alpha() == 255:
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+
+    def paint_entry(self, image, entry):
+        payload = entry.payload
+        if entry.kind == "stroke":
+            painter = QPainter(image)
+            self.prepare_stroke(painter, payload)
+            points = payload["points"]
+            start = 0
+            for end in payload["breaks"]:
+                self.draw_batch(painter, payload, points[2 * start:2 * end + 2], start == 0)
+                start = end
+        elif entry.kind == "shape":
+            p1, p2 = QPoint(*payload["p1"]), QPoint(*payload["p2"])
+            pad = payload["size"] // 2 + 2
+            entry.bbox = QRect(p1, p2).normalized().adjusted(-pad, -pad, pad, pad)
+            painter = QPainter(image)
+            self.prepare_painter(painter, self.shape_pen_for(payload), payload["antialias"])
+            rect = QRect(p1, p2)
+            if payload["tool"] == Tool.LINE:
+                painter.drawLine(p1, p2)
+            elif payload["tool"] == Tool.RECT:
+                painter.drawRect(rect)
+            elif payload["tool"] == Tool.ELLIPSE:
+                painter.drawEllipse(rect)
+        elif entry.kind == "fill":
+            x, y = payload["point"]
+            entry.bbox = flood_fill(image, x, y, premultiply(payload["rgba"]))
+        elif entry.kind == "clear":
+            image.fill(Qt.white)
+        elif entry.kind == "image":
+            return QImage(payload)
+        return image
+
+    def update_entry(self, entry):
+        self.mark_dirty(self.rect() if entry.bbox is None else entry.bbox)
+
+    def snapshot(self, image):
+        pixels = image_pixels(image)
+        tiles = {}
+        for ty in range(0, image.height(), TILE_SIZE):
+            for tx in range(0, image.width(), TILE_SIZE):
+                tile = pixels[ty:ty + TILE_SIZE, tx:tx + TILE_SIZE].tobytes()
+                key = hashlib.blake2b(tile, digest_size=16).digest()
+                self.tile_store.setdefault(key, tile)
+                tiles[(tx, ty)] = key
+        return image.size(), tiles
+
+    def restore(self, checkpoint):
+        size, tiles = checkpoint
+        image = QImage(size, QImage.Format_ARGB32_Premultiplied)
+        pixels = image_pixels(image)
+        for (tx, ty), key in tiles.items():
+            view = pixels[ty:ty + TILE_SIZE, tx:tx + TILE_SIZE]
+            view[:] = np.frombuffer(self.tile_store[key], np.uint32).reshape(view.shape)
+        return image
+
+    def collect_tiles(self):
+        live = set()
+        for entry in (*self.history, *self.redo_stack):
+            if entry.checkpoint is not None:
+                live.update(entry.checkpoint[1].values())
+        for key in self.tile_store.keys() - live:
+            del self.tile_store[key]
+
+    def record(self, entry):
+        recent = islice(reversed(self.history), CHECKPOINT_INTERVAL - 1)
+        if self.checkpoint_due or not any(e.checkpoint is not None for e in recent):
+            entry.checkpoint = self.snapshot(self.image)
+            self.checkpoint_due = False
+        self.history.append(entry)
+
+    def push_entry(self, entry):
+        dropped = bool(self.redo_stack)
+        if len(self.history) == self.history.maxlen:
+            self.history.popleft()
+            while self.history[0].checkpoint is None:
+                self.history.popleft()
+            dropped = True
         self.redo_stack.clear()
+        self.record(entry)
+        if dropped:
+            self.collect_tiles()
+        return entry
 
     def undo(self):
         if self.history:
-            self.redo_stack.append(self.pixmap.copy())
-            self.pixmap = self.history.pop()
-            self.update()
+            entry = self.history.pop()
+            self.redo_stack.append(entry)
+            base = entry
+            replay = []
+            older = reversed(self.history)
+            while base.checkpoint is None:
+                base = next(older)
+                replay.append(base)
+            image = self.restore(base.checkpoint)
+            for e in reversed(replay):
+                image = self.paint_entry(image, e)
+            self.image = self.grow_image(image, self.image.size().expandedTo(self.size()))
+            self.mark_dirty(self.rect())
 
     def redo(self):
         if self.redo_stack:
-            self.history.append(self.pixmap.copy())
-            self.pixmap = self.redo_stack.pop()
-            self.update()
+            entry = self.redo_stack.pop()
+            if entry.checkpoint is not None and entry.checkpoint[0] != self.image.size():
+                image = self.restore(entry.checkpoint)
+                self.image = self.grow_image(image, self.image.size().expandedTo(self.size()))
+                self.mark_dirty(self.rect())
+            if self.checkpoint_due:
+                entry.checkpoint = self.snapshot(self.image)
+                self.checkpoint_due = False
+            self.history.append(entry)
+            self.image = self.paint_entry(self.image, entry)
+            self.update_entry(entry)
 
     def clear(self):
-        self.save_state()
-        self.pixmap.fill(Qt.white)
-        self.update()
+        self.paint_entry(self.image, self.push_entry(HistoryEntry("clear")))
+        self.mark_dirty(self.rect())
 
     def save_image(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Image", "", "PNG (*.png);;JPG (*.jpg)")
         if path:
-            self.pixmap.save(path)
+            task = SaveTask(self.image.copy(self.rect().intersected(self.image.rect())), path)
+            task.signals.finished.connect(self.image_saved)
+            self.busy.emit("Saving…")
+            QThreadPool.globalInstance().start(task)
+
+    def image_saved(self, ok):
+        self.idle.emit("Image saved" if ok else "Could not save image")
 
     def open_image(self):
         path, _ = QFileDialog.getOpenFileName(self, "Open Image", "", "Images (*.png *.jpg *.bmp)")
         if path:
-            loaded = QPixmap(path)
-            if not loaded.isNull():
-                self.save_state()
-                self.pixmap = loaded.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.update()
-
-    def bucket_fill(self, start_point):
-        img = self.pixmap.toImage()
-        width = img.width()
-        height = img.height()
-        target_color = img.pixelColor(start_point)
-        replacement_color = self.pen_color
-        if target_color == replacement_color:
+            task = LoadTask(path, self.size())
+            task.signals.finished.connect(self.image_loaded)
+            self.busy.emit("Opening…")
+            QThreadPool.globalInstance().start(task)
+
+    def image_loaded(self, image):
+        if image is None:
+            self.idle.emit("Could not open image")
             return
+        if self.current_entry is not None:
+            self.pending_image = image
+        else:
+            self.show_loaded_image(image)
+        self.idle.emit("Image opened")
 
-        def similar(c1, c2, tol=10):
-            return (abs(c1.red() - c2.red()) <= tol and
-                    abs(c1.green() - c2.green()) <= tol and
-                    abs(c1.blue() - c2.blue()) <= tol)
-
-        stack = [start_point]
-        while stack:
-            p = stack.pop()
-            x, y = p.x(), p.y()
-            if x < 0 or x >= width or y < 0 or y >= height:
-                continue
-            if not similar(img.pixelColor(x, y), target_color):
-                continue
-
-            left = x
-            while left > 0 and similar(img.pixelColor(left - 1, y), target_color):
-                left -= 1
-            right = x
-            while right < width - 1 and similar(img.pixelColor(right + 1, y), target_color):
-                right += 1
-
-            for i in range(left, right + 1):
-                img.setPixelColor(i, y, replacement_color)
-                if y > 0 and similar(img.pixelColor(i, y - 1), target_color):
-                    stack.append(QPoint(i, y - 1))
-                if y < height - 1 and similar(img.pixelColor(i, y + 1), target_color):
-                    stack.append(QPoint(i, y + 1))
+    def show_loaded_image(self, image):
+        self.image = self.paint_entry(self.image, self.push_entry(HistoryEntry("image", image)))
+        self.mark_dirty(self.rect())
 
-        self.pixmap.convertFromImage(img)
-        self.update()
+    def bucket_fill(self, start_point):
+        entry = self.push_entry(HistoryEntry("fill", {
+            "point": (start_point.x(), start_point.y()), "rgba": self.pen_color.rgba()
+        }))
+        self.paint_entry(self.image, entry)
+        self.update_entry(entry)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -181,13 +585,28 @@ class MainWindow(QMainWindow):
         self.statusBar().addWidget(self.status)
         self.update_status()
 
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.setMaximumWidth(120)
+        self.progress.hide()
+        self.statusBar().addPermanentWidget(self.progress)
+        self.pending_tasks = 0
+        self.canvas.busy.connect(self.task_started)
+        self.canvas.idle.connect(self.task_finished)
+
+        self.pending_size = self.canvas.pen_size
+        self.size_timer = QTimer(self)
+        self.size_timer.setSingleShot(True)
+        self.size_timer.setInterval(SIZE_DEBOUNCE_MS)
+        self.size_timer.timeout.connect(self.commit_size)
+
         self.init_toolbar()
         self.apply_modern_theme()
 
     def init_toolbar(self):
+        self.icon_cache = {}
         bar = QToolBar()
         bar.setMovable(False)
-        bar.setStyleSheet("background:#1f1f1f; border-bottom:1px solid #333;")
         self.addToolBar(Qt.TopToolBarArea, bar)
 
         self.tool_buttons = {}
@@ -200,22 +619,27 @@ class MainWindow(QMainWindow):
             ("🪣", Tool.BUCKET, "Fill area")
         ]
         for icon, tool, tooltip in tools:
-            btn = QPushButton(icon)
+            btn = self.icon_button(icon)
             btn.setCheckable(True)
             btn.setToolTip(tooltip)
             btn.clicked.connect(lambda checked, t=tool: self.set_tool(t))
-            btn.setStyleSheet(self.button_style())
             bar.addWidget(btn)
             self.tool_buttons[tool] = btn
 
         bar.addSeparator()
 
-        color_btn = QPushButton("🎨")
+        color_btn = self.icon_button("🎨")
         color_btn.setToolTip("Pick color")
         color_btn.clicked.connect(self.pick_color)
-        color_btn.setStyleSheet(self.button_style())
         bar.addWidget(color_btn)
 
+        aa_btn = self.icon_button("◐")
+        aa_btn.setCheckable(True)
+        aa_btn.setChecked(self.canvas.antialiasing)
+        aa_btn.setToolTip("Smooth edges (antialiasing)")
+        aa_btn.toggled.connect(self.set_antialiasing)
+        bar.addWidget(aa_btn)
+
         actions = [
             ("↩", self.canvas.undo, "Undo"),
             ("↪", self.canvas.redo, "Redo"),
@@ -224,10 +648,9 @@ class MainWindow(QMainWindow):
             ("💾", self.canvas.save_image, "Save image")
         ]
         for icon, func, tooltip in actions:
-            btn = QPushButton(icon)
+            btn = self.icon_button(icon)
             btn.setToolTip(tooltip)
             btn.clicked.connect(func)
-            btn.setStyleSheet(self.button_style())
             bar.addWidget(btn)
 
         layout = QVBoxLayout()
@@ -244,15 +667,23 @@ class MainWindow(QMainWindow):
 
         self.update_tool_buttons()
 
-    def button_style(self):
-        return """
-            QPushButton {
-                background:#2a2a2a; color:#fff; border-radius:8px; font-size:16px;
-                padding:6px;
-            }
-            QPushButton:hover { background:#3a3a3a; }
-            QPushButton:checked { background:#1a73e8; }
-        """
+    def icon_button(self, emoji):
+        icon = self.icon_cache.get(emoji)
+        if icon is None:
+            ratio = self.devicePixelRatioF()
+            pixmap = QPixmap(round(ICON_PIXMAP_SIZE * ratio), round(ICON_PIXMAP_SIZE * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setFont(QFont("Segoe UI Emoji", 16))
+            painter.setPen(QColor("#ffffff"))
+            painter.drawText(QRect(0, 0, ICON_PIXMAP_SIZE, ICON_PIXMAP_SIZE), Qt.AlignCenter, emoji)
+            painter.end()
+            icon = self.icon_cache[emoji] = QIcon(pixmap)
+        btn = QPushButton()
+        btn.setIcon(icon)
+        btn.setIconSize(QSize(ICON_SIZE, ICON_SIZE))
+        return btn
 
     def set_tool(self, tool):
         self.canvas.tool = tool
@@ -264,28 +695,56 @@ class MainWindow(QMainWindow):
             btn.setChecked(self.canvas.tool == t)
 
     def set_size(self, size):
-        self.canvas.pen_size = size
+        self.pending_size = size
+        self.size_timer.start()
+
+    def commit_size(self):
+        self.canvas.pen_size = self.pending_size
+        self.canvas.rebuild_pens()
         self.update_status()
 
+    def set_antialiasing(self, enabled):
+        self.canvas.antialiasing = enabled
+
     def pick_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.canvas.pen_color = color
+            self.canvas.rebuild_pens()
             self.update_status()
 
+    def task_started(self, message):
+        self.pending_tasks += 1
+        self.progress.show()
+        self.statusBar().showMessage(message)
+
+    def task_finished(self, message):
+        self.pending_tasks -= 1
+        if self.pending_tasks == 0:
+            self.progress.hide()
+        self.statusBar().showMessage(message, 3000)
+
     def update_status(self):
         self.status.setText(f"Tool: {self.canvas.tool} | Size: {self.canvas.pen_size} | Color: {self.canvas.pen_color.name()}")
 
     def apply_modern_theme(self):
         self.setStyleSheet("""
             QMainWindow { background-color:#121212; color:#ffffff; }
-            QToolBar { background:#1f1f1f; spacing:6px; padding:4px; }
+            QToolBar { background:#1f1f1f; border-bottom:1px solid #333; spacing:6px; padding:4px; }
+            QToolBar QPushButton {
+                background:#2a2a2a; color:#fff; border-radius:8px;
+                padding:6px;
+            }
+            QToolBar QPushButton:hover { background:#3a3a3a; }
+            QToolBar QPushButton:checked { background:#1a73e8; }
             QSlider::groove:horizontal { height:6px; background:#333; border-radius:3px; }
             QSlider::handle:horizontal { background:#1a73e8; width:14px; margin:-4px 0; border-radius:7px; }
             QStatusBar { background:#1f1f1f; padding:4px; color:#ccc; }
         """)
 
 if __name__ == "__main__":
+    QCoreApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents)
+    QCoreApplication.setAttribute(Qt.AA_CompressTabletEvents)
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("logo.ico"))
     window = MainWindow()